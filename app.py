@@ -2,16 +2,29 @@
 # Single-file Load Board (Flask + SQLite + inline HTML/CSS)
 # Run:  pip install -r requirements.txt
 # Then: python app.py  -> http://127.0.0.1:5000
+# Prod: gunicorn -k gevent app:app  (see Procfile)
 #
 # Default admin (created on first run):
 #   email: admin@demo.com
 #   pass : admin123
 
-import sqlite3, os, re, datetime
-from functools import wraps
-from flask import Flask, g, request, redirect, url_for, session, abort, flash, send_from_directory
-from flask import render_template_string
+try:
+    # Must happen before sqlite3/flask are imported so sockets and locks
+    # cooperate with gevent greenlets when served by gunicorn -k gevent.
+    from gevent import monkey
+    monkey.patch_all()
+except ImportError:
+    pass  # plain `python app.py` dev runs work without gevent
+
+import sqlite3, os, re, datetime, queue, hmac, threading
+from functools import wraps, lru_cache
+from cachetools import TTLCache
+from flask import Flask, g, request, redirect, url_for, session, abort, flash, send_from_directory, get_flashed_messages
+from flask import Response, stream_with_context
 from werkzeug.security import generate_password_hash, check_password_hash
+from flask_caching import Cache
+from markupsafe import escape, Markup
+from jinja2 import ChoiceLoader, DictLoader, FileSystemBytecodeCache
 
 APP_TITLE = "SwiftLoad Board"
 DB_PATH   = "loadboard.db"
@@ -19,19 +32,99 @@ SECRET    = "change-this-secret"
 
 app = Flask(__name__)
 app.secret_key = SECRET
+# In-process cache; swap CACHE_TYPE for a shared backend (memcached/redis)
+# when running several gunicorn workers that must agree on cached values.
+cache = Cache(app, config={"CACHE_TYPE": "SimpleCache"})
+
+# Sessions default to Flask's signed cookie. Point SESSION_MEMCACHED at a
+# memcached host:port to keep them server-side instead: the cookie shrinks to
+# a bare session id, the per-request payload HMAC goes away, and all gunicorn
+# workers share one store. Losing the memcached node just signs everyone out.
+# Needs the optional Flask-Session + pylibmc deps (see requirements.txt).
+if os.environ.get("SESSION_MEMCACHED"):
+    import pylibmc
+    from flask_session import Session
+    app.config.update(
+        SESSION_TYPE="memcached",
+        SESSION_MEMCACHED=pylibmc.Client([os.environ["SESSION_MEMCACHED"]]),
+        PERMANENT_SESSION_LIFETIME=datetime.timedelta(days=1),
+    )
+    Session(app)
 
 # ---------------------------- DB HELPERS ----------------------------
+# Bump when init_db's DDL changes; boots where PRAGMA user_version already
+# matches skip the DDL, the seed check and the FTS rebuild entirely.
+SCHEMA_VERSION = 3  # 3: dropped the unused LOWER() expression indexes on loads
+
+# Process-wide connection pool: opening a SQLite handle per request costs
+# file opens (-wal/-shm too) plus re-running the PRAGMAs, and throws away
+# the per-connection page cache. Requests check a connection out of the
+# pool and teardown puts it back. Note we can't split read-only vs
+# read-write handles here: several GET routes (accept_bid, save_load,
+# update_status) write, so all pooled connections are writable and WAL
+# handles the reader/writer overlap.
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+_db_pool = queue.Queue(maxsize=POOL_SIZE)
+
+def _connect():
+    # isolation_level=None: plain autocommit, no implicit BEGIN before DML.
+    # Single-statement writes commit at statement end; paths that need
+    # multi-statement atomicity (accept_bid, seeding, send_message) open
+    # explicit BEGIN IMMEDIATE transactions.
+    conn = sqlite3.connect(DB_PATH, detect_types=sqlite3.PARSE_DECLTYPES,
+                           check_same_thread=False, cached_statements=256,
+                           isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    # WAL lets readers run while a writer commits; NORMAL sync skips the
+    # full fsync per commit (safe in WAL). The rest trades a little RAM
+    # for fewer disk hits: in-memory temp tables, 256MB mmap, ~20MB page cache.
+    conn.executescript("""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA mmap_size=268435456;
+        PRAGMA cache_size=-20000;
+        PRAGMA foreign_keys=ON;
+    """)
+    return conn
+
+# Hot statements as module constants: pooled connections cache prepared
+# statements by query text (bumped to 256 above), so reusing the exact same
+# string skips the parse/plan step on every call.
+SQL_INBOX = """SELECT m.*, u.name AS sender_name
+               FROM messages m JOIN users u ON u.id=m.sender_id
+               WHERE receiver_id=? ORDER BY created_at DESC"""
+SQL_SEND_MSG = "INSERT INTO messages(sender_id,receiver_id,load_id,body) VALUES(?,?,?,?)"
+SQL_ADMIN_USERS = ("SELECT id,name,email,role,company,created_at FROM users "
+                   "ORDER BY created_at DESC, id DESC LIMIT 20")
+# Keyset continuation: a composite (created_at, id) cursor stays an
+# index-range scan at any table size, unlike OFFSET which walks everything
+# it skips. The id tiebreak matters because CURRENT_TIMESTAMP is
+# second-resolution - a timestamp-only cursor drops every remaining row
+# that shares the boundary second.
+SQL_ADMIN_USERS_BEFORE = ("SELECT id,name,email,role,company,created_at FROM users "
+                          "WHERE (created_at, id) < (?, ?) "
+                          "ORDER BY created_at DESC, id DESC LIMIT 20")
+SQL_USER_BY_ID = "SELECT * FROM users WHERE id=?"
+
 def get_db():
     if "db" not in g:
-        g.db = sqlite3.connect(DB_PATH, detect_types=sqlite3.PARSE_DECLTYPES)
-        g.db.row_factory = sqlite3.Row
+        try:
+            g.db = _db_pool.get_nowait()
+        except queue.Empty:
+            g.db = _connect()
     return g.db
 
 @app.teardown_appcontext
 def close_db(_e=None):
     db = g.pop("db", None)
     if db is not None:
-        db.close()
+        if db.in_transaction:  # a failed request must not leak its transaction
+            db.rollback()
+        try:
+            _db_pool.put_nowait(db)
+        except queue.Full:
+            db.close()
 
 def init_db():
     db = get_db()
@@ -104,19 +197,101 @@ def init_db():
         FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
         FOREIGN KEY (load_id) REFERENCES loads(id) ON DELETE CASCADE
     );
+
+    -- Covering indexes for the hot filter/sort paths: the /loads listing
+    -- (status + newest-first), both dashboard branches (shipper_id /
+    -- trucker_id + newest-first), the bid list on view_load, the
+    -- saved-loads join, the inbox, and the keyset-paginated admin user
+    -- list. Text search on loads goes through loads_fts below.
+    CREATE INDEX IF NOT EXISTS idx_loads_status_created  ON loads(status, created_at DESC);
+    CREATE INDEX IF NOT EXISTS idx_loads_shipper_created ON loads(shipper_id, created_at DESC);
+    CREATE INDEX IF NOT EXISTS idx_loads_trucker_created ON loads(trucker_id, created_at DESC);
+    CREATE INDEX IF NOT EXISTS idx_bids_load_created     ON bids(load_id, created_at DESC);
+    CREATE INDEX IF NOT EXISTS idx_bids_trucker          ON bids(trucker_id, status);
+    CREATE INDEX IF NOT EXISTS idx_saved_user_created    ON saved_loads(user_id, created_at DESC);
+    CREATE INDEX IF NOT EXISTS idx_msg_recv_ts           ON messages(receiver_id, created_at DESC);
+    DROP INDEX IF EXISTS idx_users_ts;
+    CREATE INDEX IF NOT EXISTS idx_users_ts              ON users(created_at DESC, id DESC);
+    -- Shed the LOWER() expression indexes an earlier revision added: the
+    -- leading-wildcard LIKE filters they targeted could never use them, and
+    -- the FTS rewrite removed those filters anyway. Pure write cost.
+    DROP INDEX IF EXISTS idx_loads_pickup_lower;
+    DROP INDEX IF EXISTS idx_loads_delivery_lower;
+    DROP INDEX IF EXISTS idx_loads_equipment_lower;
+
+    -- Full-text index over the searchable load columns; the /loads filters
+    -- query it with prefix MATCHes instead of unsargable LIKE '%x%' scans.
+    -- external-content table, kept in sync by the triggers below.
+    CREATE VIRTUAL TABLE IF NOT EXISTS loads_fts USING fts5(
+        title, pickup_city, pickup_state, delivery_city, delivery_state, equipment,
+        content='loads', content_rowid='id'
+    );
+    CREATE TRIGGER IF NOT EXISTS loads_fts_ai AFTER INSERT ON loads BEGIN
+        INSERT INTO loads_fts(rowid, title, pickup_city, pickup_state, delivery_city, delivery_state, equipment)
+        VALUES (new.id, new.title, new.pickup_city, new.pickup_state, new.delivery_city, new.delivery_state, new.equipment);
+    END;
+    CREATE TRIGGER IF NOT EXISTS loads_fts_ad AFTER DELETE ON loads BEGIN
+        INSERT INTO loads_fts(loads_fts, rowid, title, pickup_city, pickup_state, delivery_city, delivery_state, equipment)
+        VALUES ('delete', old.id, old.title, old.pickup_city, old.pickup_state, old.delivery_city, old.delivery_state, old.equipment);
+    END;
+    CREATE TRIGGER IF NOT EXISTS loads_fts_au AFTER UPDATE ON loads BEGIN
+        INSERT INTO loads_fts(loads_fts, rowid, title, pickup_city, pickup_state, delivery_city, delivery_state, equipment)
+        VALUES ('delete', old.id, old.title, old.pickup_city, old.pickup_state, old.delivery_city, old.delivery_state, old.equipment);
+        INSERT INTO loads_fts(rowid, title, pickup_city, pickup_state, delivery_city, delivery_state, equipment)
+        VALUES (new.id, new.title, new.pickup_city, new.pickup_state, new.delivery_city, new.delivery_state, new.equipment);
+    END;
+
+    -- Repopulate from the content table so loads that predate the FTS
+    -- index (or were written while triggers were absent) become searchable.
+    INSERT INTO loads_fts(loads_fts) VALUES('rebuild');
     """)
-    # Seed admin
+    # Seed users. One executemany + one commit however many rows end up in
+    # the list - per-row execute/commit is 10-50x slower once dev fixtures
+    # get added here.
+    seed_users = [
+        ("admin","Administrator","admin@demo.com",
+         generate_password_hash("admin123"), "SwiftLoad LLC","+000000000"),
+    ]
+    db.execute("BEGIN IMMEDIATE")
     cur = db.execute("SELECT id FROM users WHERE email=?", ("admin@demo.com",))
     if not cur.fetchone():
-        db.execute(
+        db.executemany(
             "INSERT INTO users(role,name,email,password_hash,company,phone) VALUES(?,?,?,?,?,?)",
-            ("admin","Administrator","admin@demo.com", generate_password_hash("admin123"), "SwiftLoad LLC","+000000000")
+            seed_users,
         )
-    db.commit()
+    db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    db.execute("COMMIT")
 
-if not os.path.exists(DB_PATH):
+def ensure_schema():
+    """Run init_db only when the on-disk schema version is stale."""
     with app.app_context():
-        init_db()
+        if get_db().execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            init_db()
+
+def _ensure_schema_locked():
+    # Several gunicorn workers boot at once; a file lock makes sure exactly
+    # one of them runs the DDL + seed while the rest wait for it to finish.
+    try:
+        import fcntl
+    except ImportError:  # Windows dev runs single-process; no lock needed
+        fcntl = None
+    with open(DB_PATH + ".init-lock", "w") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        ensure_schema()
+
+# Every boot goes through the lock + version check, not just first runs:
+# gunicorn workers never execute __main__, so this is where an existing DB
+# with a stale user_version gets migrated. When the stamp is current the
+# whole thing costs one PRAGMA read.
+_ensure_schema_locked()
+
+# One session-cookie deserialization per request: handlers read g.user_id
+# instead of going through SecureCookieSession's lazy-load path at every
+# query call site.
+@app.before_request
+def cache_session_user():
+    g.user_id = session.get("user_id")
 
 # ---------------------------- AUTH DECORATORS ----------------------------
 def login_required(f):
@@ -205,43 +380,173 @@ footer{color:#8b93a7;font-size:.85rem;margin-top:24px;text-align:center}
     {% if msgs %}{% for m in msgs %}<div class="flash">{{ m }}</div>{% endfor %}{% endif %}
   {% endwith %}
 
-  {{ content|safe }}
+  {% block content %}{{ content|safe }}{% endblock %}
 
-  <footer>© {{ now.year }} {{ APP_TITLE }}. Built with Flask + SQLite.</footer>
+  <footer>© {{ year }} {{ APP_TITLE }}. Built with Flask + SQLite.</footer>
 </div>
+<script>
+function sendMsg(ev){
+  ev.preventDefault();
+  const f = ev.target, btn = f.querySelector('button');
+  fetch(f.action, {method:'POST', body:new FormData(f)}).then(r => {
+    btn.textContent = r.status===204 ? 'Sent ✓' : 'Failed';
+    if (r.status===204) f.reset();
+  }).catch(() => { btn.textContent = 'Failed'; });
+  return false;
+}
+</script>
 </body>
 </html>
 """
 
+# Every inline page template lives in this dict behind a DictLoader: each
+# compiles once, by name (so autoescape applies via the .html suffix), through
+# a filesystem bytecode cache that survives restarts. auto_reload is off -
+# the dict never changes at runtime, so Jinja skips staleness checks.
+TEMPLATES = {
+    "base.html": BASE,
+    "load_cards.html": """
+{%- for l in rows %}
+<div class="card">
+  <div class="flex">
+    <h3 style="margin:0">{{ l['title'] }}</h3>
+    <span class="right"><span class="badge">{{ l['status'] }}</span></span>
+  </div>
+  <p>{{ l['pickup_city'] }}, {{ l['pickup_state'] or '' }} → {{ l['delivery_city'] }}, {{ l['delivery_state'] or '' }}</p>
+  <div class="flex"><span class="badge">Weight: {{ l['weight'] or '—' }} lbs</span><span class="badge">Equip: {{ l['equipment'] or '—' }}</span><span class="badge">Rate: ${{ '%.0f'|format(l['rate'] or 0) }}</span></div>
+  <div style="margin-top:10px">
+    <a class="btn btn-sm btn-light" href="{{ url_for('view_load', load_id=l['id']) }}">View</a>
+    {%- if session.get('role')=='trucker' %}
+    <a class="btn btn-sm" href="{{ url_for('save_load', load_id=l['id']) }}">Save</a>
+    {%- endif %}
+  </div>
+</div>
+{%- else %}
+<div class='card'>No loads yet.</div>
+{%- endfor %}
+""",
+    "inbox.html": """{% extends "base.html" %}{% block content %}
+    <div class="card">
+      <h2>Inbox</h2>
+      <table class="table"><tr><th>From</th><th>Message</th><th>When</th></tr>
+      {%- for m in msgs %}
+      <tr><td>{{ m['sender_name'] }}</td><td style='max-width:520px'>{{ m['body'] }}</td><td>{{ m['created_at'] }}</td></tr>
+      {%- else %}
+      <tr><td colspan=3>No messages.</td></tr>
+      {%- endfor %}
+      </table>
+    </div>
+{% endblock %}""",
+    "admin_users.html": """
+{%- for u in users %}
+<tr><td>{{ u['id'] }}</td><td>{{ u['name'] }}</td><td>{{ u['email'] }}</td><td>{{ u['role'] }}</td><td>{{ u['company'] or '' }}</td></tr>
+{%- endfor %}
+""",
+    "profile.html": """
+<div class="grid grid-2">
+  <div class="card">
+    <h2>{{ u['name'] }}</h2>
+    <p><b>Role:</b> {{ u['role'] }}</p>
+    <p><b>Company:</b> {{ u['company'] or '—' }}</p>
+    <p><b>Phone:</b> {{ u['phone'] or '—' }} &nbsp; · &nbsp; <b>Email:</b> {{ u['email'] }}</p>
+    <p><b>MC/DOT:</b> {{ u['mc_number'] or '—' }}</p>
+  </div>
+  <div class="card">
+    <h3>Send Message</h3>
+    {{ compose|safe }}
+  </div>
+</div>
+""",
+}
+app.jinja_loader = ChoiceLoader([DictLoader(TEMPLATES), app.jinja_loader])
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+app.jinja_env.auto_reload = False
+
+BASE_TMPL        = app.jinja_env.get_template("base.html")
+LOADS_TMPL       = app.jinja_env.get_template("load_cards.html")
+INBOX_PAGE_TMPL  = app.jinja_env.get_template("inbox.html")
+ADMIN_USERS_TMPL = app.jinja_env.get_template("admin_users.html")
+PROFILE_TMPL     = app.jinja_env.get_template("profile.html")
+# Only the year is read from utcnow(); computed once per process.
+_YEAR = datetime.datetime.utcnow().year
+
 def page(content, title=None):
-    return render_template_string(BASE, content=content, title=title, APP_TITLE=APP_TITLE, now=datetime.datetime.utcnow())
+    return BASE_TMPL.render(content=content, title=title, APP_TITLE=APP_TITLE, year=_YEAR)
 
 # ---------------------------- UTIL ----------------------------
+# Successful credential checks are cached briefly so repeat logins skip
+# PBKDF2 (~100ms of pure CPU per check). The key is an HMAC of
+# email:password under the app secret, so the cache never holds
+# recoverable credentials; only confirmed-good pairs are inserted.
+_AUTH_CACHE = TTLCache(maxsize=4096, ttl=300)
+_AUTH_LOCK  = threading.Lock()
+
+def verify_password(user, email, pwd):
+    key = hmac.new(SECRET.encode(), f"{email}:{pwd}".encode(), "sha256").digest()
+    with _AUTH_LOCK:
+        if _AUTH_CACHE.get(key) == user["id"]:
+            return True
+    if check_password_hash(user["password_hash"], pwd):
+        with _AUTH_LOCK:
+            _AUTH_CACHE[key] = user["id"]
+        return True
+    return False
+
+@lru_cache(maxsize=None)
+def _url(endpoint):
+    # Constant-rule endpoints only (no path params): resolved through the
+    # URL map once under the first request, a dict hit afterwards. Used by
+    # the Python-side f-string pages; Jinja templates keep calling url_for.
+    return url_for(endpoint)
+
 def current_user():
-    if "user_id" not in session: return None
-    db = get_db()
-    return db.execute("SELECT * FROM users WHERE id=?", (session["user_id"],)).fetchone()
+    if g.user_id is None: return None
+    # Memoized on g: extra call sites within one request cost a dict hit,
+    # not another SELECT. g dies with the request context, so no cleanup.
+    if "_user" not in g:
+        g._user = get_db().execute(SQL_USER_BY_ID, (g.user_id,)).fetchone()
+    return g._user
+
+_NUM_RE = re.compile(r"^-?\d+(?:\.\d+)?$")
+# One place to tighten the accepted shape; requires a dot in the domain.
+_EMAIL_RE = re.compile(r"[^@]+@[^@]+\.[^@]+")
+# Positive integer ids from forms; one match replaces truthiness + int()
+# and keeps garbage input from raising into a 500.
+_INT_RE = re.compile(r"^\d{1,10}$")
 
 def sanitize_numeric(val, default=None):
-    try:
+    # Regex gate instead of try/except: non-numeric form input short-circuits
+    # to the default without paying exception setup in the hot filter path.
+    # Plain decimal notation only - good for every number input we render.
+    if isinstance(val, (int, float)):
         return float(val)
-    except: return default
+    if isinstance(val, str):
+        s = val.strip()
+        if _NUM_RE.match(s):
+            return float(s)
+    return default
 
 # ---------------------------- ROUTES ----------------------------
-@app.route("/")
-def home():
+@cache.cached(timeout=60, key_prefix="home_stats")
+def _home_stats():
+    # Four COUNT(*) scans per hit otherwise; a minute of staleness is fine
+    # for landing-page numbers. Writers that change the counts delete the key.
     db = get_db()
-    stats = {
+    return {
         "users": db.execute("SELECT COUNT(*) c FROM users").fetchone()["c"],
         "loads": db.execute("SELECT COUNT(*) c FROM loads").fetchone()["c"],
         "open":  db.execute("SELECT COUNT(*) c FROM loads WHERE status='open'").fetchone()["c"],
         "bids":  db.execute("SELECT COUNT(*) c FROM bids").fetchone()["c"],
     }
+
+@app.route("/")
+def home():
+    stats = _home_stats()
     content = f"""
     <div class="grid grid-2">
       <div class="card">
         <h2>Find a Load</h2>
-        <form method="get" action="{ url_for('loads') }" class="grid grid-3" style="grid-template-columns:1.2fr 1.2fr .8fr">
+        <form method="get" action="{ _url('loads') }" class="grid grid-3" style="grid-template-columns:1.2fr 1.2fr .8fr">
           <div><label>Pickup City</label><input name="pickup_city" placeholder="e.g., Dallas"></div>
           <div><label>Delivery City</label><input name="delivery_city" placeholder="e.g., Atlanta"></div>
           <div><label>Equipment</label><input name="equipment" placeholder="Dry Van / Reefer / Flatbed"></div>
@@ -277,7 +582,7 @@ def register():
         phone   = request.form.get("phone")
         mc      = request.form.get("mc_number")
 
-        if not re.match(r"[^@]+@[^@]+", email): 
+        if not _EMAIL_RE.match(email):
             flash("Invalid email"); 
         elif len(pwd) < 6:
             flash("Password must be at least 6 chars")
@@ -286,7 +591,7 @@ def register():
                 db = get_db()
                 db.execute("INSERT INTO users(role,name,email,password_hash,company,phone,mc_number) VALUES(?,?,?,?,?,?,?)",
                            (role, name, email, generate_password_hash(pwd), company, phone, mc))
-                db.commit()
+                cache.delete("home_stats")
                 flash("Registration successful. Please login.")
                 return redirect(url_for("login"))
             except sqlite3.IntegrityError:
@@ -321,7 +626,7 @@ def login():
         pwd   = request.form.get("password","")
         db = get_db()
         u = db.execute("SELECT * FROM users WHERE email=?", (email,)).fetchone()
-        if u and check_password_hash(u["password_hash"], pwd):
+        if u and verify_password(u, email, pwd):
             session["user_id"] = u["id"]
             session["role"]    = u["role"]
             session["name"]    = u["name"]
@@ -334,7 +639,7 @@ def login():
       <form method="post" class="grid grid-2">
         <div><label>Email</label><input name="email" type="email" required></div>
         <div><label>Password</label><input name="password" type="password" required></div>
-        <div style="grid-column:1/-1"><button class="btn">Login</button> <a class="btn btn-light" href="{url_for('register')}">Create account</a></div>
+        <div style="grid-column:1/-1"><button class="btn">Login</button> <a class="btn btn-light" href="{_url('register')}">Create account</a></div>
       </form>
     </div>
     """
@@ -351,34 +656,53 @@ def logout():
 @login_required
 def dashboard():
     db = get_db()
-    u = current_user()
+    # The only column ever read off the user row here was id, which the
+    # session already carries - no users SELECT needed.
+    uid = g.user_id
+    # Bid counts come back with the loads in one aggregated query instead of
+    # being fetched per row; the dashboard stays at two queries regardless of
+    # how many loads a user has. Columns are listed explicitly and the render
+    # loops unpack rows positionally - Row.__getitem__(str) walks the cursor
+    # description per access, which adds up across hundreds of cells.
+    load_cols = """l.id, l.title, l.pickup_city, l.delivery_city, l.rate, l.status,
+                   (SELECT COUNT(*) FROM bids WHERE load_id=l.id) nbids,
+                   (SELECT MIN(amount) FROM bids WHERE load_id=l.id AND status='pending') best"""
+    bid_cols = "b.id, b.amount, b.status, l.title"
     if session["role"] == "shipper":
-        myloads = db.execute("SELECT * FROM loads WHERE shipper_id=? ORDER BY created_at DESC", (u["id"],)).fetchall()
-        bids = db.execute("""SELECT b.*, l.title FROM bids b 
-                             JOIN loads l ON l.id=b.load_id 
-                             WHERE l.shipper_id=? ORDER BY b.created_at DESC""", (u["id"],)).fetchall()
+        myloads = db.execute(f"SELECT {load_cols} FROM loads l WHERE shipper_id=? ORDER BY created_at DESC",
+                             (uid,)).fetchall()
+        bids = db.execute(f"""SELECT {bid_cols} FROM bids b
+                              JOIN loads l ON l.id=b.load_id
+                              WHERE l.shipper_id=? ORDER BY b.created_at DESC""", (uid,)).fetchall()
     elif session["role"] == "trucker":
-        myloads = db.execute("SELECT * FROM loads WHERE trucker_id=? ORDER BY created_at DESC", (u["id"],)).fetchall()
-        bids = db.execute("""SELECT b.*, l.title FROM bids b 
-                             JOIN loads l ON l.id=b.load_id 
-                             WHERE b.trucker_id=? ORDER BY b.created_at DESC""", (u["id"],)).fetchall()
+        myloads = db.execute(f"SELECT {load_cols} FROM loads l WHERE trucker_id=? ORDER BY created_at DESC",
+                             (uid,)).fetchall()
+        bids = db.execute(f"""SELECT {bid_cols} FROM bids b
+                              JOIN loads l ON l.id=b.load_id
+                              WHERE b.trucker_id=? ORDER BY b.created_at DESC""", (uid,)).fetchall()
     else:
-        myloads = db.execute("SELECT * FROM loads ORDER BY created_at DESC LIMIT 10").fetchall()
-        bids = db.execute("SELECT * FROM bids ORDER BY created_at DESC LIMIT 10").fetchall()
+        myloads = db.execute(f"SELECT {load_cols} FROM loads l ORDER BY created_at DESC LIMIT 10").fetchall()
+        bids = db.execute(f"""SELECT {bid_cols} FROM bids b
+                              JOIN loads l ON l.id=b.load_id
+                              ORDER BY b.created_at DESC LIMIT 10""").fetchall()
 
-    def load_row(l):
-        st = f"<span class='badge'>{l['status']}</span>"
-        return f"<tr><td>#{l['id']}</td><td>{l['title']}</td><td>{l['pickup_city']} → {l['delivery_city']}</td><td>${l['rate'] or 0:.0f}</td><td>{st}</td><td><a class='btn btn-sm btn-light' href='{url_for('view_load', load_id=l['id'])}'>Open</a></td></tr>"
+    def load_row(lid, title, pickup, delivery, rate, status, nbids, best):
+        nb = f"{nbids}" + (f" (best ${best:.0f})" if best is not None else "")
+        title, pickup, delivery = escape(title), escape(pickup), escape(delivery)
+        return (f"<tr><td>#{lid}</td><td>{title}</td><td>{pickup} → {delivery}</td>"
+                f"<td>${rate or 0:.0f}</td><td>{nb}</td><td><span class='badge'>{status}</span></td>"
+                f"<td><a class='btn btn-sm btn-light' href='{url_for('view_load', load_id=lid)}'>Open</a></td></tr>")
 
-    loads_html = "".join(load_row(l) for l in myloads) or "<tr><td colspan=6>No records.</td></tr>"
-    bid_html = "".join([f"<tr><td>#{b['id']}</td><td>${b['amount']:.0f}</td><td>{b['status']}</td><td>{b.get('title','')}</td></tr>" for b in bids]) or "<tr><td colspan=4>No bids.</td></tr>"
+    loads_html = "".join([load_row(*l) for l in myloads]) or "<tr><td colspan=7>No records.</td></tr>"
+    bid_html = "".join([f"<tr><td>#{bid}</td><td>${amount:.0f}</td><td>{status}</td><td>{escape(title)}</td></tr>"
+                        for (bid, amount, status, title) in bids]) or "<tr><td colspan=4>No bids.</td></tr>"
 
     content = f"""
     <div class="grid grid-2">
       <div class="card">
         <h2>My Loads</h2>
         <table class="table">
-          <tr><th>ID</th><th>Title</th><th>Route</th><th>Rate</th><th>Status</th><th></th></tr>
+          <tr><th>ID</th><th>Title</th><th>Route</th><th>Rate</th><th>Bids</th><th>Status</th><th></th></tr>
           {loads_html}
         </table>
       </div>
@@ -394,16 +718,31 @@ def dashboard():
     return page(content, "Dashboard")
 
 # ---------------------------- LOADS ----------------------------
+_FTS_TOKEN_RE = re.compile(r"[A-Za-z0-9]+")
+LOADS_PER_PAGE = 50
+
+def _fts_prefix(col, text):
+    """Build a prefix MATCH term per word, e.g. 'pickup_city:dal*'.
+
+    Tokens are reduced to alphanumerics and quoted (a bare AND/OR/NOT would
+    parse as an operator) so user input can't inject FTS query syntax.
+    Returns '' when nothing searchable remains.
+    """
+    return " ".join(f'{col}:"{t}"*' for t in _FTS_TOKEN_RE.findall(text))
+
 @app.route("/loads")
 def loads():
     q = []
     args = []
-    if request.args.get("pickup_city"):
-        q.append("LOWER(pickup_city) LIKE ?"); args.append("%"+request.args["pickup_city"].lower()+"%")
-    if request.args.get("delivery_city"):
-        q.append("LOWER(delivery_city) LIKE ?"); args.append("%"+request.args["delivery_city"].lower()+"%")
-    if request.args.get("equipment"):
-        q.append("LOWER(equipment) LIKE ?"); args.append("%"+request.args["equipment"].lower()+"%")
+    # Text filters go through the FTS5 index (prefix match per word) so the
+    # search is an index lookup instead of a LIKE '%x%' full scan.
+    match = " AND ".join(m for m in (
+        _fts_prefix("pickup_city",   request.args.get("pickup_city", "")),
+        _fts_prefix("delivery_city", request.args.get("delivery_city", "")),
+        _fts_prefix("equipment",     request.args.get("equipment", "")),
+    ) if m)
+    if match:
+        q.append("id IN (SELECT rowid FROM loads_fts WHERE loads_fts MATCH ?)"); args.append(match)
     if request.args.get("min_rate"):
         q.append("rate >= ?"); args.append(sanitize_numeric(request.args["min_rate"],0))
     if request.args.get("max_weight"):
@@ -411,31 +750,31 @@ def loads():
 
     where = "WHERE " + " AND ".join(q) if q else ""
     db = get_db()
-    rows = db.execute(f"SELECT * FROM loads {where} ORDER BY created_at DESC").fetchall()
 
-    def row(l):
-        badge = f"<span class='badge'>{l['status']}</span>"
-        rate = f"${(l['rate'] or 0):.0f}"
-        return f"""
-        <div class="card">
-          <div class="flex">
-            <h3 style="margin:0">{l['title']}</h3>
-            <span class="right">{badge}</span>
-          </div>
-          <p>{l['pickup_city']}, {l['pickup_state'] or ''} → {l['delivery_city']}, {l['delivery_state'] or ''}</p>
-          <div class="flex"><span class="badge">Weight: {l['weight'] or '—'} lbs</span><span class="badge">Equip: {l['equipment'] or '—'}</span><span class="badge">Rate: {rate}</span></div>
-          <div style="margin-top:10px">
-            <a class="btn btn-sm btn-light" href="{ url_for('view_load', load_id=l['id']) }">View</a>
-            {% if session.get('role')=='trucker' %}
-            <a class="btn btn-sm" href="{ url_for('save_load', load_id=l['id']) }">Save</a>
-            {% endif %}
-          </div>
-        </div>
-        """
-    cards = "\n".join(row(l) for l in rows) or "<div class='card'>No loads yet.</div>"
+    # Page through instead of fetchall()-ing the whole table: memory and DB
+    # work stay bounded no matter how big the board gets. Fetching one row
+    # past the page tells us whether an Older link is needed without a COUNT.
+    page_arg = request.args.get("page", "1")
+    page_no = max(1, int(page_arg)) if page_arg.isdigit() else 1
+    rows = db.execute(f"SELECT * FROM loads {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                      args + [LOADS_PER_PAGE + 1, (page_no - 1) * LOADS_PER_PAGE]).fetchall()
+    has_older = len(rows) > LOADS_PER_PAGE
+    rows = rows[:LOADS_PER_PAGE]
+
+    cards = LOADS_TMPL.render(rows=rows)
+
+    def page_url(n):
+        qs = request.args.to_dict(); qs["page"] = n
+        return url_for("loads", **qs)
+    pager = ""
+    if page_no > 1 or has_older:
+        newer = f"<a class='btn btn-sm btn-light' href='{page_url(page_no-1)}'>← Newer</a>" if page_no > 1 else ""
+        older = f"<a class='btn btn-sm btn-light right' href='{page_url(page_no+1)}'>Older →</a>" if has_older else ""
+        pager = f"<div class='flex' style='margin-top:14px'>{newer}{older}</div>"
 
     content = f"""
     <div class="grid grid-3">{cards}</div>
+    {pager}
     """
     return page(content, "Browse Loads")
 
@@ -447,11 +786,11 @@ def new_load():
         db = get_db()
         db.execute("""INSERT INTO loads(shipper_id,title,pickup_city,pickup_state,pickup_date,delivery_city,delivery_state,delivery_date,weight,equipment,rate,notes)
                       VALUES(?,?,?,?,?,?,?,?,?,?,?,?)""",
-                   (session["user_id"], f.get("title"), f.get("pickup_city"), f.get("pickup_state"),
+                   (g.user_id, f.get("title"), f.get("pickup_city"), f.get("pickup_state"),
                     f.get("pickup_date"), f.get("delivery_city"), f.get("delivery_state"),
                     f.get("delivery_date"), sanitize_numeric(f.get("weight")), f.get("equipment"),
                     sanitize_numeric(f.get("rate")), f.get("notes")))
-        db.commit()
+        cache.delete("home_stats")
         flash("Load posted.")
         return redirect(url_for("loads"))
     content = """
@@ -478,20 +817,27 @@ def new_load():
 @app.route("/load/<int:load_id>")
 def view_load(load_id):
     db = get_db()
-    l = db.execute("SELECT * FROM loads WHERE id=?", (load_id,)).fetchone()
+    # Shipper contact rides along with the load row instead of a second SELECT.
+    l = db.execute("""SELECT l.*, u.name AS shipper_name, u.company AS shipper_company,
+                             u.phone AS shipper_phone, u.email AS shipper_email
+                      FROM loads l LEFT JOIN users u ON u.id=l.shipper_id
+                      WHERE l.id=?""", (load_id,)).fetchone()
     if not l: abort(404)
-    shipper = db.execute("SELECT name,company,phone,email FROM users WHERE id=?", (l["shipper_id"]),).fetchone()
-    if shipper is None:
-        shipper = {"name": "Unknown", "company": None, "phone": None, "email": "unknown@example.com"}
-    bids = db.execute("""SELECT b.*, u.name FROM bids b JOIN users u ON u.id=b.trucker_id
+    shipper = {"name": l["shipper_name"] or "Unknown", "company": l["shipper_company"],
+               "phone": l["shipper_phone"], "email": l["shipper_email"] or "unknown@example.com"}
+    bids = db.execute("""SELECT b.id, b.amount, b.status, u.name
+                         FROM bids b JOIN users u ON u.id=b.trucker_id
                          WHERE b.load_id=? ORDER BY b.created_at DESC""", (load_id,)).fetchall()
 
-    # Bid list
+    # Bid list: row tuples unpack to locals so the loop body is pure
+    # interpolation, and the manage check runs once instead of per row.
+    can_manage = g.user_id==l["shipper_id"] or session.get("role")=="admin"
     bid_html = "".join([
-        f"<tr><td>${b['amount']:.0f}</td><td>{b['name']}</td><td>{b['status']}</td>"
-        + ( f"<td><a class='btn btn-sm btn-success' href='{url_for('accept_bid', bid_id=b['id'])}'>Accept</a> "
-            f"<a class='btn btn-sm btn-danger' href='{url_for('reject_bid', bid_id=b['id'])}'>Reject</a></td>" if session.get("user_id")==l["shipper_id"] or session.get("role")=='admin' else "<td></td>")
+        f"<tr><td>${amount:.0f}</td><td>{escape(name)}</td><td>{status}</td>"
+        + ( f"<td><a class='btn btn-sm btn-success' href='{url_for('accept_bid', bid_id=bid)}'>Accept</a> "
+            f"<a class='btn btn-sm btn-danger' href='{url_for('reject_bid', bid_id=bid)}'>Reject</a></td>" if can_manage else "<td></td>")
         + "</tr>"
+        for (bid, amount, status, name) in bids
     ]) or "<tr><td colspan=4>No bids yet.</td></tr>"
 
     # Actions
@@ -521,38 +867,28 @@ def view_load(load_id):
         </div>
         """
 
-    # Compose widget function rendered directly here is not available; replace with simple compose form when logged in
-    compose_form = ""
-    if session.get("user_id"):
-        compose_form = f"""
-        <form method="post" action="{url_for('send_message')}" class="grid grid-3" style="grid-template-columns:1fr .6fr .4fr">
-          <input type="hidden" name="load_id" value="{l['id']}">
-          <div><label>Message</label><input name="body" placeholder="Type a quick note..." required></div>
-          <div><label>To (User ID)</label><input name="to" required></div>
-          <div style="align-self:end"><button class="btn btn-light btn-sm">Send</button></div>
-        </form>
-        """
+    compose_form = compose_widget(load_id=l["id"]) if g.user_id else ""
 
     content = f"""
     <div class="grid grid-2">
       <div class="card">
-        <h2>{l['title']}</h2>
+        <h2>{escape(l['title'])}</h2>
         <div class="flex" style="gap:8px">
           <span class="badge">#{l['id']}</span>
           <span class="badge">{l['status']}</span>
           <span class="badge">Rate: ${l['rate'] or 0:.0f}</span>
-          <span class="badge">Equip: {l['equipment'] or '—'}</span>
+          <span class="badge">Equip: {escape(l['equipment'] or '—')}</span>
           <span class="badge">Weight: {l['weight'] or '—'} lbs</span>
         </div>
         <hr>
-        <p><b>Route:</b> {l['pickup_city']}, {l['pickup_state'] or ''} → {l['delivery_city']}, {l['delivery_state'] or ''}</p>
-        <p><b>Pickup:</b> {l['pickup_date'] or 'TBD'} &nbsp; | &nbsp; <b>Delivery:</b> {l['delivery_date'] or 'TBD'}</p>
-        <p style="white-space:pre-wrap">{(l['notes'] or '').strip()}</p>
+        <p><b>Route:</b> {escape(l['pickup_city'])}, {escape(l['pickup_state'] or '')} → {escape(l['delivery_city'])}, {escape(l['delivery_state'] or '')}</p>
+        <p><b>Pickup:</b> {escape(l['pickup_date'] or 'TBD')} &nbsp; | &nbsp; <b>Delivery:</b> {escape(l['delivery_date'] or 'TBD')}</p>
+        <p style="white-space:pre-wrap">{escape((l['notes'] or '').strip())}</p>
       </div>
       <div class="card">
         <h3>Shipper</h3>
-        <p><b>{shipper['name']}</b> — {shipper['company'] or '—'}</p>
-        <p>☎ {shipper['phone'] or '—'} &nbsp; · &nbsp; ✉ {shipper['email']}</p>
+        <p><b>{escape(shipper['name'])}</b> — {escape(shipper['company'] or '—')}</p>
+        <p>☎ {escape(shipper['phone'] or '—')} &nbsp; · &nbsp; ✉ {escape(shipper['email'])}</p>
       </div>
     </div>
 
@@ -580,13 +916,13 @@ def place_bid(load_id):
     db = get_db()
     # prevent duplicate pending bid
     existing = db.execute("SELECT id FROM bids WHERE load_id=? AND trucker_id=? AND status='pending'",
-                          (load_id, session["user_id"])).fetchone()
+                          (load_id, g.user_id)).fetchone()
     if existing:
         flash("You already have a pending bid on this load.")
         return redirect(url_for("view_load", load_id=load_id))
     db.execute("INSERT INTO bids(load_id,trucker_id,amount,message) VALUES(?,?,?,?)",
-               (load_id, session["user_id"], amt, msg))
-    db.commit()
+               (load_id, g.user_id, amt, msg))
+    cache.delete("home_stats")
     flash("Bid submitted.")
     return redirect(url_for("view_load", load_id=load_id))
 
@@ -594,15 +930,26 @@ def place_bid(load_id):
 @login_required
 def accept_bid(bid_id):
     db = get_db()
-    b = db.execute("""SELECT b.*, l.shipper_id FROM bids b 
-                      JOIN loads l ON l.id=b.load_id WHERE b.id=?""",(bid_id,)).fetchone()
-    if not b: abort(404)
-    if session["user_id"] != b["shipper_id"] and session.get("role")!="admin": abort(403)
-    # Accept this bid, reject others, assign load to trucker
-    db.execute("UPDATE bids SET status='accepted' WHERE id=?", (bid_id,))
-    db.execute("UPDATE bids SET status='rejected' WHERE load_id=? AND id<>?", (b["load_id"], bid_id))
-    db.execute("UPDATE loads SET status='assigned', trucker_id=? WHERE id=?", (b["trucker_id"], b["load_id"]))
-    db.commit()
+    # One BEGIN IMMEDIATE transaction: the write lock is taken up front, so
+    # no concurrent bid can slip in between the permission check and the
+    # updates, and accept/reject-others/assign commit as a single unit.
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        b = db.execute("""SELECT b.load_id, l.shipper_id FROM bids b
+                          JOIN loads l ON l.id=b.load_id WHERE b.id=?""",(bid_id,)).fetchone()
+        if not b: abort(404)
+        if g.user_id != b["shipper_id"] and session.get("role")!="admin": abort(403)
+        accepted = db.execute("UPDATE bids SET status='accepted' WHERE id=? RETURNING load_id, trucker_id",
+                              (bid_id,)).fetchone()
+        db.execute("UPDATE bids SET status='rejected' WHERE load_id=? AND id<>?", (accepted["load_id"], bid_id))
+        db.execute("UPDATE loads SET status='assigned', trucker_id=? WHERE id=?",
+                   (accepted["trucker_id"], accepted["load_id"]))
+        db.execute("COMMIT")
+    except Exception:
+        if db.in_transaction:
+            db.execute("ROLLBACK")
+        raise
+    cache.delete("home_stats")  # assigning the load shrinks the open count
     flash("Bid accepted and load assigned.")
     return redirect(url_for("view_load", load_id=b["load_id"]))
 
@@ -613,9 +960,8 @@ def reject_bid(bid_id):
     b = db.execute("""SELECT b.*, l.shipper_id FROM bids b 
                       JOIN loads l ON l.id=b.load_id WHERE b.id=?""",(bid_id,)).fetchone()
     if not b: abort(404)
-    if session["user_id"] != b["shipper_id"] and session.get("role")!="admin": abort(403)
+    if g.user_id != b["shipper_id"] and session.get("role")!="admin": abort(403)
     db.execute("UPDATE bids SET status='rejected' WHERE id=?", (bid_id,))
-    db.commit()
     flash("Bid rejected.")
     return redirect(url_for("view_load", load_id=b["load_id"]))
 
@@ -626,9 +972,9 @@ def update_status(load_id, status):
     db = get_db()
     l = db.execute("SELECT shipper_id FROM loads WHERE id=?", (load_id,)).fetchone()
     if not l: abort(404)
-    if session["user_id"] != l["shipper_id"] and session.get("role")!="admin": abort(403)
+    if g.user_id != l["shipper_id"] and session.get("role")!="admin": abort(403)
     db.execute("UPDATE loads SET status=? WHERE id=?", (status, load_id))
-    db.commit()
+    cache.delete("home_stats")  # status flips move loads in/out of the open count
     flash(f"Status updated to {status}.")
     return redirect(url_for("view_load", load_id=load_id))
 
@@ -638,8 +984,7 @@ def update_status(load_id, status):
 def save_load(load_id):
     db = get_db()
     try:
-        db.execute("INSERT OR IGNORE INTO saved_loads(user_id,load_id) VALUES(?,?)", (session["user_id"], load_id))
-        db.commit()
+        db.execute("INSERT OR IGNORE INTO saved_loads(user_id,load_id) VALUES(?,?)", (g.user_id, load_id))
         flash("Saved.")
     except:
         flash("Could not save.")
@@ -649,10 +994,12 @@ def save_load(load_id):
 @role_required("trucker")
 def saved():
     db = get_db()
-    rows = db.execute("""SELECT l.* FROM saved_loads s 
+    rows = db.execute("""SELECT l.id, l.title, l.pickup_city, l.delivery_city FROM saved_loads s
                          JOIN loads l ON l.id=s.load_id
-                         WHERE s.user_id=? ORDER BY s.created_at DESC""", (session["user_id"],)).fetchall()
-    items = "".join([f"<li><a href='{url_for('view_load', load_id=r['id'])}'>#{r['id']} · {r['title']} · {r['pickup_city']}→{r['delivery_city']}</a></li>" for r in rows]) or "<li>None</li>"
+                         WHERE s.user_id=? ORDER BY s.created_at DESC""", (g.user_id,)).fetchall()
+    saved_row = Markup("<li><a href='%s'>#%d · %s · %s→%s</a></li>")
+    items = "".join([saved_row % (url_for("view_load", load_id=lid), lid, title, pickup, delivery)
+                     for (lid, title, pickup, delivery) in rows]) or "<li>None</li>"
     content = f"""
     <div class="card">
       <h2>Saved Loads</h2>
@@ -662,44 +1009,55 @@ def saved():
     return page(content, "Saved Loads")
 
 # ---------------------------- MESSAGING ----------------------------
+# The inbox page template lives in TEMPLATES (see HTML SHELL) so it can
+# stream rows via Template.generate() while inheriting the base shell.
 @app.route("/inbox")
 @login_required
 def inbox():
-    db = get_db()
-    msgs = db.execute("""SELECT m.*, u.name AS sender_name 
-                         FROM messages m JOIN users u ON u.id=m.sender_id
-                         WHERE receiver_id=? ORDER BY created_at DESC""", (session["user_id"],)).fetchall()
-    rows = "".join([f"<tr><td>{m['sender_name']}</td><td style='max-width:520px'>{m['body']}</td><td>{m['created_at']}</td></tr>" for m in msgs]) or "<tr><td colspan=3>No messages.</td></tr>"
-    content = f"""
-    <div class="card">
-      <h2>Inbox</h2>
-      <table class="table"><tr><th>From</th><th>Message</th><th>When</th></tr>{rows}</table>
-    </div>
-    """
-    return page(content, "Inbox")
+    cur = get_db().execute(SQL_INBOX, (g.user_id,))
+    # Pop flashes now, while the session cookie can still record it - Flask
+    # serializes the session before the generator runs, so a pop inside the
+    # stream would resurrect the flashes on the next page. The template's own
+    # get_flashed_messages() returns this request-cached list.
+    get_flashed_messages()
+    # stream_with_context keeps the request (and its pooled connection)
+    # alive until the generator is exhausted.
+    stream = INBOX_PAGE_TMPL.generate(msgs=cur, title="Inbox", APP_TITLE=APP_TITLE, year=_YEAR)
+    return Response(stream_with_context(stream), mimetype="text/html")
 
 @app.route("/message/send", methods=["POST"])
 @login_required
 def send_message():
-    receiver_id = request.form.get("to")
-    load_id     = request.form.get("load_id")
+    receiver_id = (request.form.get("to") or "").strip()
+    load_id     = (request.form.get("load_id") or "").strip()
     body        = (request.form.get("body") or "").strip()
-    if not receiver_id or not body:
-        flash("Message needs a recipient and content.")
-        return redirect(request.referrer or url_for("inbox"))
+    # Posted via fetch() from the compose forms (see sendMsg in BASE): a bare
+    # 204 lets the page update in place instead of paying a redirect
+    # round-trip through request.referrer.
+    if not (_INT_RE.match(receiver_id) and body):
+        return ("Message needs a recipient and content.", 400)
     db = get_db()
-    db.execute("INSERT INTO messages(sender_id,receiver_id,load_id,body) VALUES(?,?,?,?)",
-               (session["user_id"], int(receiver_id), int(load_id) if load_id else None, body))
-    db.commit()
-    flash("Message sent.")
-    return redirect(request.referrer or url_for("inbox"))
+    # BEGIN IMMEDIATE takes the write lock up front so concurrent senders
+    # queue on the lock instead of failing with SQLITE_BUSY mid-statement.
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        db.execute(SQL_SEND_MSG,
+                   (g.user_id, int(receiver_id), int(load_id) if _INT_RE.match(load_id) else None, body))
+        db.execute("COMMIT")
+    except sqlite3.IntegrityError:
+        # Hand-typed recipient/load ids are ordinary input; a typo trips the
+        # foreign keys, not a 500.
+        db.execute("ROLLBACK")
+        return ("No such recipient or load.", 400)
+    return ("", 204)
 
 # Quick compose widget (render helper)
+@lru_cache(maxsize=1024)
 def compose_widget(to_id=None, load_id=None):
     to_id = to_id or ""
     load_id = load_id or ""
     return f"""
-    <form method="post" action="{url_for('send_message')}" class="grid grid-3" style="grid-template-columns:1fr .6fr .4fr">
+    <form method="post" action="{_url('send_message')}" onsubmit="return sendMsg(event)" class="grid grid-3" style="grid-template-columns:1fr .6fr .4fr">
       <input type="hidden" name="load_id" value="{load_id}">
       <div><label>Message</label><input name="body" placeholder="Type a quick note..." required></div>
       <div><label>To (User ID)</label><input name="to" value="{to_id}" required></div>
@@ -712,11 +1070,21 @@ def compose_widget(to_id=None, load_id=None):
 @role_required("admin")
 def admin():
     db = get_db()
-    ucount = db.execute("SELECT COUNT(*) c FROM users").fetchone()["c"]
-    lcount = db.execute("SELECT COUNT(*) c FROM loads").fetchone()["c"]
-    bcount = db.execute("SELECT COUNT(*) c FROM bids").fetchone()["c"]
-    users  = db.execute("SELECT id,name,email,role,company FROM users ORDER BY created_at DESC LIMIT 20").fetchall()
-    rows = "".join([f"<tr><td>{u['id']}</td><td>{u['name']}</td><td>{u['email']}</td><td>{u['role']}</td><td>{u['company'] or ''}</td></tr>" for u in users])
+    # One round-trip for all three counts instead of three prepare/step cycles.
+    ucount, lcount, bcount = db.execute(
+        "SELECT (SELECT COUNT(*) FROM users),(SELECT COUNT(*) FROM loads),(SELECT COUNT(*) FROM bids)"
+    ).fetchone()
+    before    = request.args.get("before", "").strip()
+    before_id = request.args.get("before_id", "").strip()
+    if before and _INT_RE.match(before_id):
+        users = db.execute(SQL_ADMIN_USERS_BEFORE, (before, int(before_id))).fetchall()
+    else:
+        users = db.execute(SQL_ADMIN_USERS).fetchall()
+    rows = ADMIN_USERS_TMPL.render(users=users)
+    pager = ""
+    if len(users) == 20:  # a full page probably has older rows behind it
+        last = users[-1]
+        pager = f"<div style='margin-top:10px'><a class='btn btn-sm btn-light' href='{url_for('admin', before=last['created_at'], before_id=last['id'])}'>Older →</a></div>"
     content = f"""
     <div class="card">
       <h2>Admin Dashboard</h2>
@@ -728,6 +1096,7 @@ def admin():
       <hr>
       <h3>Recent Users</h3>
       <table class="table"><tr><th>ID</th><th>Name</th><th>Email</th><th>Role</th><th>Company</th></tr>{rows}</table>
+      {pager}
     </div>
     """
     return page(content, "Admin")
@@ -737,23 +1106,9 @@ def admin():
 @login_required
 def user_profile(user_id):
     db = get_db()
-    u = db.execute("SELECT * FROM users WHERE id=?", (user_id,)).fetchone()
+    u = db.execute(SQL_USER_BY_ID, (user_id,)).fetchone()
     if not u: abort(404)
-    content = f"""
-    <div class="grid grid-2">
-      <div class="card">
-        <h2>{u['name']}</h2>
-        <p><b>Role:</b> {u['role']}</p>
-        <p><b>Company:</b> {u['company'] or '—'}</p>
-        <p><b>Phone:</b> {u['phone'] or '—'} &nbsp; · &nbsp; <b>Email:</b> {u['email']}</p>
-        <p><b>MC/DOT:</b> {u['mc_number'] or '—'}</p>
-      </div>
-      <div class="card">
-        <h3>Send Message</h3>
-        {compose_widget(to_id=u['id'])}
-      </div>
-    </div>
-    """
+    content = PROFILE_TMPL.render(u=u, compose=compose_widget(to_id=u["id"]))
     return page(content, f"{u['name']} - Profile")
 
 # ---------------------------- QUICK COMPOSE ON LOAD PAGE ----------------------------
@@ -762,25 +1117,42 @@ def inject_helpers():
     return dict(compose_widget=compose_widget)
 
 # ---------------------------- EXTRA: headers ----------------------------
+_STATIC_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "Referrer-Policy": "same-origin",
+}
+
 @app.after_request
 def add_headers(resp):
-    resp.headers["X-Content-Type-Options"] = "nosniff"
-    resp.headers["X-Frame-Options"] = "DENY"
-    resp.headers["Referrer-Policy"] = "same-origin"
+    # Runs on 100% of responses; one bulk update beats three per-key inserts.
+    resp.headers.update(_STATIC_HEADERS)
     return resp
 
 # ---------------------------- 404/403 ----------------------------
+# Rendered once at import (inside a bare request context, i.e. with the
+# signed-out nav) instead of a full page() render per hit - 404s are often
+# the bulk of hostile traffic, so the handlers should cost nothing.
+with app.test_request_context():
+    _E403_PAGE = page("<div class='card'><h2>Forbidden</h2><p>You don’t have permission for that action.</p></div>","Forbidden")
+    _E404_PAGE = page("<div class='card'><h2>Not Found</h2><p>The resource you requested doesn’t exist.</p></div>","Not Found")
+
 @app.errorhandler(403)
 def e403(_e):
-    return page("<div class='card'><h2>Forbidden</h2><p>You don’t have permission for that action.</p></div>","Forbidden"), 403
+    return _E403_PAGE, 403
 
 @app.errorhandler(404)
 def e404(_e):
-    return page("<div class='card'><h2>Not Found</h2><p>The resource you requested doesn’t exist.</p></div>","Not Found"), 404
+    return _E404_PAGE, 404
 
 # ---------------------------- LAUNCH ----------------------------
+# Conventional WSGI alias: `gunicorn app:application` and `waitress-serve
+# app:application` both find it, alongside the existing app:app.
+application = app
+
 if __name__ == "__main__":
-    # Ensure DB exists
-    with app.app_context():
-        init_db()
-    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)), debug=True)
+    # Debug (reloader + per-request source stat()s + debugger hook) is now
+    # opt-in: set FLASK_DEBUG=1. No debug kwarg - app.run() reads FLASK_DEBUG
+    # itself with proper falsy parsing (0/false/no stay off). Production runs
+    # under a real WSGI server.
+    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))